@@ -1,76 +1,166 @@
 import json
+import orjson
+import numpy as np
 import pandas as pd
-from statistics import mean
-from typing import Dict, List, Any
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from typing import Dict, List, Any, Optional
+from itertools import chain, repeat
 import streamlit as st
-import matplotlib.pyplot as plt
-import matplotlib.dates
 from datetime import datetime, timezone
 import plotly.graph_objects as go
 import os
 
-def load_data(file_path: str) -> Dict[str, Any]:
-    """Load JSON data from the specified file path."""
-    with open(file_path, 'r') as file:
-        return json.load(file)
+@st.cache_data(show_spinner=False)
+def load_data(file_path: str, mtime: float = None) -> Dict[str, Any]:
+    """Load JSON data from the specified file path; mtime keys the cache to the file version."""
+    with open(file_path, 'rb') as file:
+        return normalize_icao_codes(orjson.loads(file.read()))
 
-def calculate_metrics(data: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Calculate listener count metrics for each feed."""
-    results = []
+def normalize_icao_codes(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Store an upper-cased copy of each feed's ICAO code as static_data['icao_upper']."""
+    for feed_data in data.values():
+        static_data = feed_data.get('static_data')
+        if static_data and 'icao' in static_data:
+            static_data['icao_upper'] = static_data['icao'].upper()
+    return data
+
+@st.cache_data(show_spinner=False)
+def calculate_metrics(_data: Dict[str, Any], data_key: Any) -> Dict[str, Any]:
+    """
+    Calculate listener count metrics for each feed, returned as equal-length columns.
     
-    for feed_name, feed_data in data.items():
-        if 'time_series' not in feed_data:
-            continue
-            
-        time_series = feed_data['time_series']
-        
-        # Skip feeds with no time series data
-        if not time_series:
-            continue
-            
-        listener_counts = [entry.get('listeners', 0) for entry in time_series]
-        total_listener_counts = [entry.get('total_listeners', 0) for entry in time_series]
-        
-        # Calculate metrics
-        avg_listeners = mean(listener_counts) if listener_counts else 0
-        max_listeners = max(listener_counts) if listener_counts else 0
-        avg_total_listeners = mean(total_listener_counts) if total_listener_counts else 0
-        
+    Args:
+        _data: The loaded feed data (not hashed by Streamlit's cache)
+        data_key: Cheap identifier of the loaded dataset, used as the cache key
+    """
+    # Skip feeds with no time series data
+    feeds = [(feed_name, feed_data) for feed_name, feed_data in _data.items()
+             if feed_data.get('time_series')]
+    
+    # Pack every feed's samples into one contiguous buffer with per-feed offsets
+    # so each metric is computed for all feeds in a single segmented reduction
+    lengths = np.fromiter((len(feed_data['time_series']) for _, feed_data in feeds),
+                          dtype=np.int64, count=len(feeds))
+    offsets = np.zeros(len(feeds) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    n = int(offsets[-1])
+    
+    # map(dict.get, ...) performs the per-entry lookup (missing keys read as 0)
+    # in C instead of resuming a Python generator frame for every sample
+    entries = chain.from_iterable(feed_data['time_series'] for _, feed_data in feeds)
+    listener_counts = np.fromiter(map(dict.get, entries, repeat('listeners'), repeat(0)), dtype=np.int32, count=n)
+    entries = chain.from_iterable(feed_data['time_series'] for _, feed_data in feeds)
+    total_listener_counts = np.fromiter(map(dict.get, entries, repeat('total_listeners'), repeat(0)), dtype=np.int32, count=n)
+    
+    # Calculate metrics; sums accumulate in int64 and the integer columns are
+    # stored as int32 since listener counts are small. The averages stay float64
+    # so the displayed and exported values are exact
+    if feeds:
+        starts = offsets[:-1]
+        avg_listeners = np.add.reduceat(listener_counts, starts, dtype=np.int64) / lengths
+        max_listeners = np.maximum.reduceat(listener_counts, starts)
+        avg_total_listeners = np.add.reduceat(total_listener_counts, starts, dtype=np.int64) / lengths
+    else:
+        avg_listeners = np.empty(0, dtype=np.float64)
+        max_listeners = np.empty(0, dtype=np.int32)
+        avg_total_listeners = np.empty(0, dtype=np.float64)
+    
+    # String columns stay as Python lists; numeric columns are already arrays
+    feed_names = []
+    icaos = []
+    locations = []
+    channel_types = []
+    
+    for feed_name, feed_data in feeds:
         # Get location and ICAO if available
         static_data = feed_data.get('static_data', {})
-        location = static_data.get('location', 'N/A')
-        icao = static_data.get('icao', 'N/A')
-        channel_types = ', '.join(static_data.get('channel_types', ['N/A']))
-        
-        results.append({
-            'feed_name': feed_name,
-            'icao': icao,
-            'location': location,
-            'channel_types': channel_types,
-            'avg_listeners': avg_listeners,
-            'max_listeners': max_listeners,
-            'avg_total_listeners': avg_total_listeners,
-            'data_points': len(time_series)
-        })
+        feed_names.append(feed_name)
+        icaos.append(static_data.get('icao', 'N/A'))
+        locations.append(static_data.get('location', 'N/A'))
+        channel_types.append(', '.join(static_data.get('channel_types', ['N/A'])))
+    
+    return {
+        'feed_name': feed_names,
+        'icao': icaos,
+        'location': locations,
+        'channel_types': channel_types,
+        'avg_listeners': avg_listeners,
+        'max_listeners': max_listeners,
+        'avg_total_listeners': avg_total_listeners,
+        'data_points': lengths.astype(np.int32)
+    }
+
+def load_metrics_cache(file_path: str, mtime: float) -> Optional[Dict[str, Any]]:
+    """
+    Read the Parquet metrics side-cache written next to file_path.
+    
+    Returns the metric columns, or None if there is no cache or it was
+    written for a different version (mtime) of the JSON file.
+    """
+    try:
+        table = pq.read_table(f"{file_path}.metrics.parquet")
+    except (OSError, pa.ArrowInvalid):
+        return None
+    
+    metadata = table.schema.metadata or {}
+    if metadata.get(b'source_mtime') != repr(mtime).encode():
+        return None
+    
+    # Caches written before the averages were kept in float64 are treated as stale
+    if table.schema.field('avg_listeners').type != pa.float64():
+        return None
     
-    return results
+    # Numeric columns come back as NumPy arrays, string columns as lists,
+    # matching what calculate_metrics returns
+    return {
+        name: column.to_numpy() if pa.types.is_integer(column.type) or pa.types.is_floating(column.type)
+        else column.to_pylist()
+        for name, column in zip(table.column_names, table.columns)
+    }
 
-def display_airport_histogram(data: Dict[str, Any], airport_code: str, start_date: str = None, end_date: str = None):
+def save_metrics_cache(file_path: str, mtime: float, metrics: Dict[str, Any]):
+    """Write the metric columns to a Parquet side-cache tagged with the JSON file's mtime."""
+    table = pa.Table.from_pydict(metrics).replace_schema_metadata({'source_mtime': repr(mtime)})
+    try:
+        pq.write_table(table, f"{file_path}.metrics.parquet")
+    except OSError:
+        # The cache is only an optimization; a read-only directory is fine
+        pass
+
+@st.cache_data(show_spinner=False)
+def build_icao_index(_data: Dict[str, Any], data_key: Any) -> Dict[str, List[str]]:
+    """
+    Map each upper-cased ICAO code to the names of the feeds that share it.
+    
+    Expects data that has been through normalize_icao_codes.
+    
+    Args:
+        _data: The loaded feed data (not hashed by Streamlit's cache)
+        data_key: Cheap identifier of the loaded dataset, used as the cache key
+    """
+    index = {}
+    for feed_name, feed_data in _data.items():
+        icao = feed_data.get('static_data', {}).get('icao_upper')
+        if icao:
+            index.setdefault(icao, []).append(feed_name)
+    return index
+
+def display_airport_histogram(data: Dict[str, Any], data_key: Any, airport_code: str, start_date: str = None, end_date: str = None):
     """
     Display a histogram of listener counts for a specific airport over time.
     
     Args:
         data: The loaded feed data
+        data_key: Identifier of the loaded dataset, used to cache the ICAO index
         airport_code: ICAO or other identifier to search for
         start_date: Optional start date in format YYYY-MM-DD
         end_date: Optional end date in format YYYY-MM-DD
     """
     # Find all feeds matching the airport code exactly
-    matching_feeds = {}
-    for feed_name, feed_data in data.items():
-        if 'static_data' in feed_data and 'icao' in feed_data['static_data']:
-            if airport_code.upper() == feed_data['static_data']['icao'].upper():
-                matching_feeds[feed_name] = feed_data
+    feed_names = build_icao_index(data, data_key).get(airport_code.upper(), [])
+    matching_feeds = {feed_name: data[feed_name] for feed_name in feed_names}
     
     if not matching_feeds:
         st.error(f"Identifier not found: {airport_code}")
@@ -78,8 +168,14 @@ def display_airport_histogram(data: Dict[str, Any], airport_code: str, start_dat
     
     st.write(f"Found {len(matching_feeds)} feeds for airport code: {airport_code}")
     
-    # Create a Plotly figure for interactive visualization
-    fig = go.Figure()
+    # Collect one trace per feed and build the figure from them in one go
+    traces = []
+    
+    # Parse the date range bounds once rather than for every feed, as epoch
+    # nanoseconds; open ends default to the int64 limits. NaT is stored as the
+    # int64 minimum, so the lower default (min + 1) also excludes it
+    start_ns = pd.Timestamp(f"{start_date}T00:00:00+00:00").value if start_date else np.iinfo(np.int64).min + 1
+    end_ns = pd.Timestamp(f"{end_date}T23:59:59+00:00").value if end_date else np.iinfo(np.int64).max
     
     # Process each feed
     for feed_name, feed_data in matching_feeds.items():
@@ -87,53 +183,35 @@ def display_airport_histogram(data: Dict[str, Any], airport_code: str, start_dat
             continue
             
         # Extract timestamps and listener counts
-        timestamps = []
-        listener_counts = []
-        hover_texts = []
+        entries = [entry for entry in feed_data['time_series']
+                   if 'timestamp' in entry and 'listeners' in entry]
+        listener_counts = np.fromiter((entry['listeners'] for entry in entries), dtype=np.int64, count=len(entries))
+        
+        # Convert all timestamps in one vectorized call; unparseable values become NaT
+        timestamps = pd.to_datetime([entry['timestamp'] for entry in entries],
+                                    utc=True, format='ISO8601', errors='coerce')
         
-        for entry in feed_data['time_series']:
-            if 'timestamp' in entry and 'listeners' in entry:
-                try:
-                    # Convert timestamp to datetime
-                    dt = datetime.fromisoformat(entry['timestamp'].replace('Z', '+00:00'))
-                    
-                    # Apply date filtering if specified
-                    if start_date:
-                        start_dt = datetime.fromisoformat(f"{start_date}T00:00:00+00:00")
-                        if dt < start_dt:
-                            continue
-                    if end_date:
-                        end_dt = datetime.fromisoformat(f"{end_date}T23:59:59+00:00") 
-                        if dt > end_dt:
-                            continue
-                            
-                    timestamps.append(dt)
-                    listeners = entry['listeners']
-                    listener_counts.append(listeners)
-                    
-                    # Create hover text with details
-                    hover_text = f"Feed: {feed_name}<br>" + \
-                                 f"Time: {dt.strftime('%Y-%m-%d %H:%M:%S')}<br>" + \
-                                 f"Listeners: {listeners}"
-                    hover_texts.append(hover_text)
-                    
-                except (ValueError, TypeError):
-                    continue
+        # Apply date filtering (and drop NaT) with one branch-free range check
+        epochs = timestamps.asi8
+        mask = (epochs >= start_ns) & (epochs <= end_ns)
         
-        if timestamps and listener_counts:
+        timestamps = timestamps[mask]
+        listener_counts = listener_counts[mask]
+        
+        if len(timestamps) and len(listener_counts):
             # Add a trace for this feed
-            fig.add_trace(go.Scatter(
+            traces.append(go.Scatter(
                 x=timestamps,
                 y=listener_counts,
                 mode='lines',
                 name=feed_name,
-                hoverinfo='text',
-                hovertext=hover_texts,
+                # Hover text is formatted client-side from the point's own x/y
+                hovertemplate=f"Feed: {feed_name}<br>Time: %{{x|%Y-%m-%d %H:%M:%S}}<br>Listeners: %{{y:d}}<extra></extra>",
                 line=dict(width=2),
             ))
     
-    # Customize layout
-    fig.update_layout(
+    # Create a Plotly figure for interactive visualization with a customized layout
+    fig = go.Figure(data=traces, layout=go.Layout(
         title=f"Listener Counts for {airport_code}",
         xaxis_title="Time",
         yaxis_title="Number of Listeners",
@@ -142,26 +220,65 @@ def display_airport_histogram(data: Dict[str, Any], airport_code: str, start_dat
         height=600,
         width=None,  # Let Streamlit determine the width
         margin=dict(l=20, r=20, t=40, b=20),
-    )
-    
-    # Add grid
-    fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='LightGrey')
-    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='LightGrey')
+        # Add grid
+        xaxis=dict(showgrid=True, gridwidth=1, gridcolor='LightGrey'),
+        yaxis=dict(showgrid=True, gridwidth=1, gridcolor='LightGrey'),
+    ))
     
     # Display the interactive plot in Streamlit
     st.plotly_chart(fig, use_container_width=True)
 
-def sort_and_display(metrics: List[Dict[str, Any]], sort_by: str = 'avg_listeners', ascending: bool = False, limit: int = None):
-    """Sort the metrics and display the results in a tabular format."""
-    # Convert to DataFrame for easier sorting and display
-    df = pd.DataFrame(metrics)
+def metrics_to_dataframe(metrics: Dict[str, Any]) -> pd.DataFrame:
+    """Wrap the metric columns in a DataFrame without consolidating them."""
+    # copy=False keeps every column in its own contiguous 1-D block rather than
+    # stacking same-dtype columns into a shared 2-D block
+    return pd.DataFrame(metrics, copy=False)
+
+@st.cache_data(show_spinner=False)
+def to_csv_bytes(_df: pd.DataFrame, cache_key: Any) -> bytes:
+    """
+    Encode a DataFrame as CSV bytes using Arrow's multithreaded C++ CSV writer.
     
-    # Sort the DataFrame
-    df_sorted = df.sort_values(by=sort_by, ascending=ascending)
+    Args:
+        _df: The DataFrame to encode (not hashed by Streamlit's cache)
+        cache_key: Identifier of the dataset and view that produced _df
+    """
+    sink = pa.BufferOutputStream()
+    pa_csv.write_csv(pa.Table.from_pandas(_df, preserve_index=False), sink)
+    return sink.getvalue().to_pybytes()
+
+def sort_and_display(metrics: Dict[str, Any], sort_by: str = 'avg_listeners', ascending: bool = False, limit: int = None):
+    """Sort the metrics and display the results in a tabular format."""
+    sort_column = metrics[sort_by]
     
-    # Apply limit if specified
-    if limit:
-        df_sorted = df_sorted.head(limit)
+    if isinstance(sort_column, np.ndarray) and sort_column.dtype.kind in 'iuf':
+        # Numeric columns are ordered directly on their NumPy arrays, and only
+        # the selected rows are materialized as a DataFrame
+        if ascending:
+            order = np.argsort(sort_column, kind='stable')
+        else:
+            # Descending without negating, which would wrap unsigned values: a stable
+            # ascending sort of the reversed column, mapped back to original positions
+            # and reversed, keeps tied rows in their original order
+            reversed_order = np.argsort(sort_column[::-1], kind='stable')
+            order = (len(sort_column) - 1 - reversed_order)[::-1]
+        
+        # Apply limit if specified
+        if limit:
+            order = order[:limit]
+        
+        df_sorted = metrics_to_dataframe({
+            name: values[order] if isinstance(values, np.ndarray) else [values[i] for i in order]
+            for name, values in metrics.items()
+        })
+    else:
+        # String columns are left to pandas
+        df = metrics_to_dataframe(metrics)
+        df_sorted = df.sort_values(by=sort_by, ascending=ascending)
+        
+        # Apply limit if specified
+        if limit:
+            df_sorted = df_sorted.head(limit)
     
     # Add a row number column that starts at 1
     df_sorted = df_sorted.reset_index(drop=True)
@@ -187,6 +304,7 @@ def main():
     # Get last modified date for local file if it exists
     local_file_path = "liveatc_feeds.json"
     local_file_label = "Use existing file (liveatc_feeds.json)"
+    mod_time = None
     
     try:
         # Get file modification time
@@ -205,13 +323,23 @@ def main():
     )
     
     data = None
+    data_key = None
+    metrics = None
     
     if data_source == local_file_label:  # Use updated label in condition
         # Use the local file
         try:
-            with st.spinner('Loading local file...'):
-                data = load_data(local_file_path)
-            st.success(f"Loaded local data for {len(data)} feeds.")
+            data_key = (local_file_path, mod_time)
+            # A fresh Parquet side-cache skips the JSON parse entirely; the feed
+            # data is then only loaded if the histogram view needs it
+            metrics = load_metrics_cache(local_file_path, mod_time)
+            if metrics is not None:
+                st.success(f"Loaded cached metrics for {len(metrics['feed_name'])} feeds.")
+            else:
+                # The mtime argument makes reruns reuse the parsed data until the file changes
+                with st.spinner('Loading local file...'):
+                    data = load_data(local_file_path, mod_time)
+                st.success(f"Loaded local data for {len(data)} feeds.")
         except FileNotFoundError:
             st.error(f"Local file not found at {local_file_path}. Please upload a file instead.")
             data_source = "Upload a new JSON file"  # Switch to upload option
@@ -226,15 +354,19 @@ def main():
         if uploaded_file is not None:
             # Load data from uploaded file
             with st.spinner('Loading uploaded file...'):
-                data = json.load(uploaded_file)
+                data = normalize_icao_codes(orjson.loads(uploaded_file.getvalue()))
+            data_key = ('upload', uploaded_file.file_id)
             st.success(f"Loaded uploaded data for {len(data)} feeds.")
     
     # Continue only if we have data
-    if data is not None:
-        # Calculate metrics
-        with st.spinner('Calculating metrics...'):
-            metrics = calculate_metrics(data)
-        st.write(f"Calculated metrics for {len(metrics)} feeds.")
+    if data is not None or metrics is not None:
+        if metrics is None:
+            # Calculate metrics
+            with st.spinner('Calculating metrics...'):
+                metrics = calculate_metrics(data, data_key)
+            if data_source == local_file_label:
+                save_metrics_cache(local_file_path, mod_time, metrics)
+        st.write(f"Calculated metrics for {len(metrics['feed_name'])} feeds.")
         
         # Sidebar for analysis options
         st.sidebar.header("Analysis Options")
@@ -280,7 +412,7 @@ def main():
             
             # Add download button
             if st.button("Download as CSV"):
-                csv = sorted_data.to_csv(index=False)
+                csv = to_csv_bytes(sorted_data, (data_key, sort_column, ascending, limit))
                 st.download_button(
                     label="Download CSV file",
                     data=csv,
@@ -306,7 +438,17 @@ def main():
             
             if airport_code:
                 if st.button("Generate Histogram"):
-                    display_airport_histogram(data, airport_code, start_date_str, end_date_str)
+                    if data is None:
+                        # Metrics came from the side-cache; the time series still need the JSON
+                        try:
+                            with st.spinner('Loading local file...'):
+                                data = load_data(local_file_path, mod_time)
+                        except FileNotFoundError:
+                            st.error(f"Local file not found at {local_file_path}. Please upload a file instead.")
+                        except json.JSONDecodeError:
+                            st.error(f"Invalid JSON format in the local file. Please upload a valid file instead.")
+                    if data is not None:
+                        display_airport_histogram(data, data_key, airport_code, start_date_str, end_date_str)
             else:
                 st.info("Please enter an airport code to generate a histogram.")
                 
@@ -314,12 +456,13 @@ def main():
             st.header("Export All Data")
             
             # Create DataFrame for all data
-            df = pd.DataFrame(metrics)
+            df = metrics_to_dataframe(metrics)
             
             st.dataframe(df)
             
             # Add download button for full dataset
-            csv = df.to_csv(index=False)
+            # Encoded once per dataset rather than on every rerun
+            csv = to_csv_bytes(df, (data_key, 'all'))
             st.download_button(
                 label="Download Complete Dataset as CSV",
                 data=csv,
@@ -1,180 +1,254 @@
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
-import json
+import lxml.html
+from lxml import etree
+import gzip
+import orjson
 import re
+import heapq
+from operator import itemgetter
 import os
 from datetime import datetime, timezone, timedelta
 import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import boto3
+from botocore.exceptions import ClientError
 
-# Data structure to hold our extracted information
-class AirportFeed:
-    def __init__(self, icao, location, status, listeners, total_listeners, 
-                 channel_types, metar, frequencies, timestamp, feed_name):
-        self.icao = icao
-        self.location = location
-        self.status = status
-        self.listeners = listeners
-        self.total_listeners = total_listeners
-        self.channel_types = channel_types
-        self.metar = metar
-        self.frequencies = frequencies
-        self.timestamp = timestamp
-        self.feed_name = feed_name
-    
-    def to_dict(self):
-        return {
-            "icao": self.icao,
-            "location": self.location,
-            "status": self.status,
-            "listeners": self.listeners,
-            "total_listeners": self.total_listeners,
-            "channel_types": self.channel_types,
-            "metar": self.metar,
-            "frequencies": self.frequencies,
-            "timestamp": self.timestamp,
-            "feed_name": self.feed_name
-        }
+# One HTML parser shared by every page; comments are kept because they split text
+# nodes, which matters for the stripped-text joins below
+_HTML_PARSER = lxml.html.HTMLParser(remove_pis=True)
+
+# XPath expressions compiled once rather than on every lookup
+_MAIN_TABLE_XPATH = etree.XPath('(//table[@width="900"][@border="1"][@bordercolor="#333333"][@bgcolor="#EEEEEE"])[1]')
+_FEED_CELL_XPATH = etree.XPath('.//td[@bgcolor="lightgreen" or @bgcolor="pink"]')
+_FREQ_TD_XPATH = etree.XPath('.//td[@valign="top"]')
+_PURSEP_FONT_XPATH = etree.XPath('(.//font[contains(concat(" ", normalize-space(@class), " "), " purSep ")])[1]')
+# Text nodes under an element, leaving out script and style contents
+_TEXT_NODES_XPATH = etree.XPath('descendant::text()[not(ancestor::script or ancestor::style)]')
+
+# Patterns used by extract_feed_data, compiled once instead of once per feed row
+# METAR text typically starts with a 4-letter ICAO code followed by date/time and weather info
+# Example: FIMP 170800Z 04011KT 9999 FEW015CB SCT017 31/25 Q1011
+# The match stops at the end of the line or before an "Airport Info" / "Flight Activity" link
+_METAR_RE = re.compile(r'([A-Z]{4}\s\d{6}Z(?:(?!Airport Info|Flight Activity)[^\n])+)')
+_WS_RE = re.compile(r'\s+')
+# "Airport Info" / "Flight Activity" link lines, skipped when looking for frequencies and listeners
+_SKIP_RE = re.compile(r'Airport Info|Flight Activity')
+_LISTENERS_RE = re.compile(r'Listeners:\s*(\d+)\s*out of\s*(\d+)')
+_PARTITION_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+# Define mappings for channel type detection from the frequencies string
+_CHANNEL_TYPE_MAPPINGS = {
+    'Tower': ['Tower', 'Twr', 'TWR'],
+    'Approach': ['Approach', 'App', 'APP', 'Arrival', 'ARR'],
+    'Departure': ['Departure', 'Dep', 'DEP'],
+    'Ground': ['Ground', 'Gnd', 'GND'],
+    'Center': ['Center', 'Centre', 'Ctr', 'CTR', 'Control', 'CTRL'],
+    'ATIS': ['ATIS', 'Information', 'Info', 'INFO'],
+    'Clearance': ['Clearance', 'Clnc', 'CLNC', 'Delivery', 'Del', 'DEL'],
+    'Ramp': ['Ramp', 'Apron', 'APN'],
+    'Operations': ['Operations', 'Ops', 'OPS'],
+    'Radio': ['Radio', 'Unicom', 'UNICOM'],
+    'Director': ['Director', 'Dir', 'DIR'],
+    'Radar': ['Radar', 'RAD'],
+    'Terminal': ['Terminal', 'TMA'],
+    'Area': ['Area', 'ACC'],
+    'Flight Service': ['Flight Service', 'FSS'],
+    'Surface': ['Surface', 'SMC'],
+    'Pre-Departure': ['Pre-Departure', 'PDC'],
+    'Final': ['Final', 'FIN'],
+    'Emergency': ['Emergency', 'EMERG']
+}
+# Channel type -> position in the mapping, the order new types are reported in
+_CHANNEL_TYPE_ORDER = {channel_type: position for position, channel_type in enumerate(_CHANNEL_TYPE_MAPPINGS)}
+# Lowercase keyword -> channel type
+_CHANNEL_KEYWORDS = {keyword.lower(): channel_type
+                     for channel_type, keywords in _CHANNEL_TYPE_MAPPINGS.items()
+                     for keyword in keywords}
+# A keyword counts as an exact word match when it is surrounded by spaces (or the
+# start/end of the string), followed by ": " or "/" after a space, or preceded by
+# ":" or "/" and followed by a space
+_CHANNEL_KEYWORD_ALT = '|'.join(re.escape(keyword)
+                                for keyword in sorted(_CHANNEL_KEYWORDS, key=len, reverse=True))
+_CHANNEL_RE = re.compile(
+    rf'(?<![^ ])(?:{_CHANNEL_KEYWORD_ALT})(?![^ ])'
+    rf'|(?<= )(?:{_CHANNEL_KEYWORD_ALT})(?=: |/)'
+    rf'|(?<=[:/])(?:{_CHANNEL_KEYWORD_ALT})(?= )'
+)
+# Substring of the feed title (strong tag) -> channel type, checked in this order
+_TITLE_CHANNELS = (
+    ('Twr', 'Tower'),
+    ('App', 'Approach'),
+    ('Dep', 'Departure'),
+    ('Gnd', 'Ground'),
+    ('Ctr', 'Center'),
+    ('Center', 'Center'),
+    ('ATIS', 'ATIS')
+)
 
+# Returns the raw page bytes; _parse_html works out the encoding from the markup,
+# which skips aiohttp's charset detection in response.text()
 async def fetch(session, url):
     async with session.get(url) as response:
-        return await response.text()
+        return await response.read()
+
+# All the text under an element
+def _element_text(element):
+    return ''.join(_TEXT_NODES_XPATH(element))
+
+# Whitespace-stripped, non-empty text nodes under an element
+def _stripped_strings(element):
+    return [text for text in (node.strip() for node in _TEXT_NODES_XPATH(element)) if text]
+
+# The next <tr> after a row in document order (including the row's own nested rows), limited
+# to the 900px-wide tables that hold the feed listings. Walks outwards from the row through
+# its following siblings, so the usual case of an adjacent row is found immediately
+def _next_row(row):
+    def following_rows():
+        yield from row.iterdescendants('tr')
+        node = row
+        while node is not None:
+            for sibling in node.itersiblings():
+                yield from sibling.iter('tr')
+            node = node.getparent()
+    
+    for tr in following_rows():
+        if any(table.get('width') == '900' for table in tr.iterancestors('table')):
+            return tr
+    return None
+
+# Parses a feed page into an lxml tree. Bytes that are valid UTF-8 are decoded up front;
+# anything else is left to libxml2, which honours the page's declared charset.
+# Decoded pages are cut down to start at the main feed table (found by a plain substring
+# search for its border colour), so the page header and navigation are never parsed
+def _parse_html(html):
+    if isinstance(html, bytes):
+        try:
+            html = html.decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+    if isinstance(html, str):
+        marker = html.find('bordercolor="#333333"')
+        if marker != -1:
+            start = html.rfind('<table', 0, marker)
+            if start != -1:
+                html = html[start:]
+    try:
+        return lxml.html.document_fromstring(html, parser=_HTML_PARSER)
+    except (etree.ParserError, ValueError):
+        return None
+
+# Frequencies are the text of the first font tag with class="purSep" in a td with
+# valign="top"; tds whose font is an "Airport Info" / "Flight Activity" line are skipped
+def _frequencies_from_tds(valign_top_tds):
+    for td in valign_top_tds:
+        freq_fonts = _PURSEP_FONT_XPATH(td)
+        if freq_fonts:
+            freq_text = ''.join(_stripped_strings(freq_fonts[0]))
+            if not _SKIP_RE.search(freq_text):
+                return freq_text
+    return ""
 
+# Yields one feed record per row of the feed table, a dict with the keys icao, location,
+# status, listeners, total_listeners, channel_types, metar, frequencies, timestamp and feed_name
 def extract_feed_data(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    feeds = []
+    root = _parse_html(html)
     
     # Find the main table containing feed information
-    main_table = None
-    for table in soup.find_all('table'):
-        if (table.get('width') == '900' and 
-            table.get('border') == '1' and 
-            table.get('bordercolor') == '#333333' and 
-            table.get('bgcolor') == '#EEEEEE'):
-            main_table = table
-            break
+    main_table = _MAIN_TABLE_XPATH(root) if root is not None else []
     
     if not main_table:
         print("Could not find the main feed table")
-        return feeds
+        return
     
     # Find all rows that contain cells with the target background colors
-    feed_cells = main_table.select('td[bgcolor="lightgreen"], td[bgcolor="pink"]')
-    feed_rows = [cell.find_parent('tr') for cell in feed_cells]
-    
-    for row in feed_rows:
+    for cell in _FEED_CELL_XPATH(main_table[0]):
+        row = next(cell.iterancestors('tr'), None)
         try:
+            # Walk the row once, picking out every element the extraction below needs
+            icao_element = None
+            strong_tag = None
+            status_span = None
+            nav_fonts = []
+            pursep_fonts = []
+            valign_top_tds = []
+            td_count = 0
+            for element in row.iterdescendants():
+                tag_name = element.tag
+                if tag_name == 'font':
+                    classes = (element.get('class') or '').split()
+                    if 'nav' in classes:
+                        nav_fonts.append(element)
+                    if 'purSep' in classes:
+                        pursep_fonts.append(element)
+                elif tag_name == 'td':
+                    td_count += 1
+                    if element.get('valign') == 'top':
+                        valign_top_tds.append(element)
+                elif tag_name == 'span':
+                    if status_span is None and 'purSep' in (element.get('class') or '').split():
+                        status_span = element
+                elif tag_name == 'strong':
+                    if strong_tag is None:
+                        strong_tag = element
+                elif tag_name == 'a':
+                    if icao_element is None and element.get('name') is not None:
+                        icao_element = element
+            
             # Extract ICAO code from the name attribute of the anchor tag
-            icao_element = row.find('a', {'name': True})
-            if not icao_element:
+            if icao_element is None:
                 continue
                 
             icao = icao_element.get('name')
             
             # Extract location - it's in a font tag with class="nav"
             location = "Unknown"
-            nav_fonts = row.find_all('font', {'class': 'nav'})
             if nav_fonts and len(nav_fonts) > 0:
                 # The location is typically in the first font tag with class="nav"
-                location = nav_fonts[0].text.strip()
+                location = _element_text(nav_fonts[0]).strip()
             
             # Extract status (UP/DOWN) - it's in a font tag within a span with class="purSep"
             status = "Unknown"
-            status_span = row.find('span', {'class': 'purSep'})
-            if status_span:
-                status_font = status_span.find('font')
-                if status_font:
-                    status = status_font.text.strip()
+            if status_span is not None:
+                status_font = status_span.find('.//font')
+                if status_font is not None:
+                    status = _element_text(status_font).strip()
             
             # Extract channel types from the title in the strong tag
             # use the frequencies for this
-            channel_types = []
+            # A dict used as an insertion-ordered set: O(1) membership, first-seen order kept
+            channel_types = {}
             # print(row)
-            strong_tag = row.find('strong')
-            if strong_tag:
-                title_text = strong_tag.text
-                if 'Twr' in title_text:
-                    channel_types.append('Tower')
-                if 'App' in title_text:
-                    channel_types.append('Approach')
-                if 'Dep' in title_text:
-                    channel_types.append('Departure')
-                if 'Gnd' in title_text:
-                    channel_types.append('Ground')
-                if 'Ctr' in title_text or 'Center' in title_text:
-                    channel_types.append('Center')
-                if 'ATIS' in title_text:
-                    channel_types.append('ATIS')
+            if strong_tag is not None:
+                title_text = _element_text(strong_tag)
+                for substring, channel_type in _TITLE_CHANNELS:
+                    if substring in title_text:
+                        channel_types[channel_type] = None
             
             # Extract METAR if available - it's after a <br /> tag within the purSep span
             metar_text = ""
-            if status_span:
-                # Convert the status_span to string to search for METAR
-                status_span_str = str(status_span)
-                
-                # Find METAR pattern - typically starts with 4-letter ICAO code followed by date/time and weather info
-                # Example: FIMP 170800Z 04011KT 9999 FEW015CB SCT017 31/25 Q1011
-                metar_pattern = re.compile(r'<br />((?:[A-Z]{4}\s\d{6}Z.+?)(?=<br />|$))')
-                metar_match = metar_pattern.search(status_span_str)
+            if status_span is not None:
+                # Put every text node of the span on its own line, so the METAR is the
+                # line starting with a 4-letter ICAO code followed by date/time
+                status_text = '\n'.join(_stripped_strings(status_span))
+                metar_match = _METAR_RE.search(status_text)
                 
                 if metar_match:
-                    metar_text = metar_match.group(1).strip()
-                else:
-                    # Alternative pattern for some feeds
-                    alt_pattern = re.compile(r'UTC</font><br><br />((?:[A-Z]{4}\s\d{6}Z.+?)(?=<br />|$))')
-                    alt_match = alt_pattern.search(status_span_str)
-                    if alt_match:
-                        metar_text = alt_match.group(1).strip()
-                
-                # If still no match, try a more general approach
-                if not metar_text:
-                    # Look for any text that looks like a METAR (ICAO code followed by date/time)
-                    general_pattern = re.compile(r'([A-Z]{4}\s\d{6}Z\s+[\w\d\s/]+\s+Q\d{4}(?:\s+\w+)?)')
-                    general_match = general_pattern.search(status_span_str)
-                    if general_match:
-                        metar_text = general_match.group(1).strip()
-                
-                # If still no match, try an even more general pattern
-                if not metar_text:
-                    # Look for any text that starts with an ICAO code and date/time
-                    basic_pattern = re.compile(r'([A-Z]{4}\s\d{6}Z\s+[^<]+)')
-                    basic_match = basic_pattern.search(status_span_str)
-                    if basic_match:
-                        metar_text = basic_match.group(1).strip()
-                
-                # Clean up the METAR text - remove any HTML tags that might have been captured
-                if metar_text:
-                    # Remove any HTML tags
-                    metar_text = re.sub(r'<[^>]+>', '', metar_text)
                     # Remove any extra whitespace
-                    metar_text = re.sub(r'\s+', ' ', metar_text).strip()
-                    
-                    # Validate the METAR format - it should start with an ICAO code (4 uppercase letters)
-                    if not re.match(r'^[A-Z]{4}\s\d{6}Z', metar_text):
-                        metar_text = ""  # Invalid METAR format, reset to empty
-                    
-                    # Make sure we don't have "Airport Info" or "Flight Activity" in the METAR
-                    if 'Airport Info' in metar_text or 'Flight Activity' in metar_text:
-                        # Try to extract just the METAR part before these strings
-                        clean_metar = re.match(r'^([A-Z]{4}\s\d{6}Z[^A]*)(?:Airport Info|Flight Activity)', metar_text)
-                        if clean_metar:
-                            metar_text = clean_metar.group(1).strip()
-                        else:
-                            metar_text = ""  # Can't extract a clean METAR
+                    metar_text = _WS_RE.sub(' ', metar_match.group(1)).strip()
             
             # Extract listener count - it's in a font tag with class="purSep" after the status span
             listeners = 0
             total_listeners = 0
-            listener_fonts = row.find_all('font', {'class': 'purSep'})
-            for font in listener_fonts:
+            for font in pursep_fonts:
+                font_text = _element_text(font)
                 # Skip "Airport Info" and "Flight Activity" lines
-                if 'Airport Info' in font.text or 'Flight Activity' in font.text:
+                if _SKIP_RE.search(font_text):
                     continue
                 
-                if 'Listeners:' in font.text:
-                    listeners_pattern = re.compile(r'Listeners:\s*(\d+)\s*out of\s*(\d+)')
-                    listeners_match = listeners_pattern.search(font.text)
+                if 'Listeners:' in font_text:
+                    listeners_match = _LISTENERS_RE.search(font_text)
                     if listeners_match:
                         listeners = int(listeners_match.group(1))
                         total_listeners = int(listeners_match.group(2))
@@ -182,100 +256,43 @@ def extract_feed_data(html):
             
             # Extract frequencies - they're in the next cell (td) with valign="top"
             frequencies = ""
-            # Get all td elements in the current row
-            tds = row.find_all('td')
-            if len(tds) > 1:
-                # The frequencies are in the last td with valign="top"
-                for td in tds:
-                    if td.get('valign') == 'top':
-                        # Look for font tags with class="purSep" inside this td
-                        freq_fonts = td.find_all('font', {'class': 'purSep'})
-                        if freq_fonts:
-                            # Get all the text from the font tag and split by <br> tags
-                            freq_text = freq_fonts[0].get_text(strip=True)
-                            # Skip if it contains "Airport Info" or "Flight Activity"
-                            if 'Airport Info' not in freq_text and 'Flight Activity' not in freq_text:
-                                # Replace <br> tags with spaces to join multiple frequency lines
-                                frequencies = freq_text
-                                break
+            if td_count > 1:
+                frequencies = _frequencies_from_tds(valign_top_tds)
             
             # If frequencies is still empty, try another approach
             if not frequencies:
                 # Try to find the frequencies in the next row's td
-                next_row = row.find_next('tr')
-                if next_row:
-                    next_tds = next_row.find_all('td')
-                    for td in next_tds:
-                        if td.get('valign') == 'top':
-                            freq_fonts = td.find_all('font', {'class': 'purSep'})
-                            if freq_fonts:
-                                freq_text = freq_fonts[0].get_text(strip=True)
-                                if 'Airport Info' not in freq_text and 'Flight Activity' not in freq_text:
-                                    frequencies = freq_text
-                                    break
+                next_row = _next_row(row)
+                if next_row is not None:
+                    frequencies = _frequencies_from_tds(_FREQ_TD_XPATH(next_row))
             
             # print("\nExtracted frequencies:", frequencies)
             
             # Extract additional channel types from frequencies string
             if frequencies:
-                # Define mappings for channel type detection
-                channel_type_mappings = {
-                    'Tower': ['Tower', 'Twr', 'TWR'],
-                    'Approach': ['Approach', 'App', 'APP', 'Arrival', 'ARR'],
-                    'Departure': ['Departure', 'Dep', 'DEP'],
-                    'Ground': ['Ground', 'Gnd', 'GND'],
-                    'Center': ['Center', 'Centre', 'Ctr', 'CTR', 'Control', 'CTRL'],
-                    'ATIS': ['ATIS', 'Information', 'Info', 'INFO'],
-                    'Clearance': ['Clearance', 'Clnc', 'CLNC', 'Delivery', 'Del', 'DEL'],
-                    'Ramp': ['Ramp', 'Apron', 'APN'],
-                    'Operations': ['Operations', 'Ops', 'OPS'],
-                    'Radio': ['Radio', 'Unicom', 'UNICOM'],
-                    'Director': ['Director', 'Dir', 'DIR'],
-                    'Radar': ['Radar', 'RAD'],
-                    'Terminal': ['Terminal', 'TMA'],
-                    'Area': ['Area', 'ACC'],
-                    'Flight Service': ['Flight Service', 'FSS'],
-                    'Surface': ['Surface', 'SMC'],
-                    'Pre-Departure': ['Pre-Departure', 'PDC'],
-                    'Final': ['Final', 'FIN'],
-                    'Emergency': ['Emergency', 'EMERG']
-                }
-                
-                # Convert frequencies to lowercase for case-insensitive matching
-                frequencies_lower = frequencies.lower()
-                
-                # Check for each channel type in the frequencies string
-                for channel_type, keywords in channel_type_mappings.items():
-                    for keyword in keywords:
-                        # Check for exact word match (surrounded by spaces, colon, or at beginning/end)
-                        keyword_lower = keyword.lower()
-                        if (f" {keyword_lower} " in f" {frequencies_lower} " or 
-                            f" {keyword_lower}: " in frequencies_lower or 
-                            f":{keyword_lower} " in frequencies_lower or
-                            frequencies_lower.startswith(f"{keyword_lower} ") or
-                            frequencies_lower.endswith(f" {keyword_lower}") or
-                            f" {keyword_lower}/" in frequencies_lower or
-                            f"/{keyword_lower} " in frequencies_lower):
-                            if channel_type not in channel_types:
-                                channel_types.append(channel_type)
-                                break
+                # Convert frequencies to lowercase for case-insensitive matching and
+                # scan it once for every keyword
+                found_types = {_CHANNEL_KEYWORDS[match.group()]
+                               for match in _CHANNEL_RE.finditer(frequencies.lower())}
+                for channel_type in sorted(found_types, key=_CHANNEL_TYPE_ORDER.__getitem__):
+                    channel_types.setdefault(channel_type)
             
             # Current timestamp in UTC
             timestamp = datetime.now(timezone.utc).isoformat()
             
             # Extract feed name from the strong tag text
             feed_name = "Unknown Feed"
-            if strong_tag and strong_tag.find('a'):
-                feed_name = strong_tag.find('a').text.strip()
-            elif strong_tag and strong_tag.text.strip() != "DOWN":
-                feed_name = strong_tag.text.strip()
+            strong_link = strong_tag.find('.//a') if strong_tag is not None else None
+            if strong_link is not None:
+                feed_name = _element_text(strong_link).strip()
+            elif strong_tag is not None and _element_text(strong_tag).strip() != "DOWN":
+                feed_name = _element_text(strong_tag).strip()
             else:
                 # For DOWN feeds or when strong tag is not available
                 # The feed name is in the first font tag with class="nav"
-                nav_fonts = row.find_all('font', {'class': 'nav'})
                 if nav_fonts and len(nav_fonts) > 0:
                     # Get the text content of the first nav font
-                    nav_text = nav_fonts[0].get_text(separator=' ', strip=True)
+                    nav_text = ' '.join(_stripped_strings(nav_fonts[0]))
                     
                     # For DOWN feeds, we need to construct the feed name from the ICAO code and the channel types
                     # The nav text typically contains the ICAO code followed by the channel types (e.g., "FLKK Twr/App")
@@ -284,35 +301,34 @@ def extract_feed_data(html):
                     # Fallback to using location and ICAO if no feed name found
                     feed_name = f"{location} ({icao})"
             
-            # Create AirportFeed object
-            feed = AirportFeed(
-                icao=icao,
-                location=location,
-                status=status,
-                listeners=listeners,
-                total_listeners=total_listeners,
-                channel_types=channel_types,
-                metar=metar_text,
-                frequencies=frequencies,
-                timestamp=timestamp,
-                feed_name=feed_name
-            )
-            
-            feeds.append(feed)
+            yield {
+                "icao": icao,
+                "location": location,
+                "status": status,
+                "listeners": listeners,
+                "total_listeners": total_listeners,
+                "channel_types": list(channel_types),
+                "metar": metar_text,
+                "frequencies": frequencies,
+                "timestamp": timestamp,
+                "feed_name": feed_name
+            }
             
         except Exception as e:
             print(f"Error processing feed: {e}")
-    
-    return feeds
 
-# New function to update feed data that can be used by both S3 and local storage methods
-def update_feed_data(existing_data, feeds):
+# List of feed records for one page; a plain module-level function so it can be sent to a worker process
+def parse_feed_page(html):
+    return list(extract_feed_data(html))
+
+# New function to update feed data that can be used by both S3 and local storage methods.
+# Takes the feed records of one scrape, as yielded by extract_feed_data
+def update_feed_data(existing_data, feed_records):
     # Track feed names we've already seen in this scrape
     processed_feed_names = set()
     
     # Update with new data
-    for feed in feeds:
-        feed_dict = feed.to_dict()
+    for feed_dict in feed_records:
         feed_name = feed_dict['feed_name']
         
         # Skip if we've already processed a feed with this name in the current scrape
@@ -322,9 +338,10 @@ def update_feed_data(existing_data, feeds):
         # Mark this feed as processed
         processed_feed_names.add(feed_name)
         
-        if feed_name not in existing_data:
+        entry = existing_data.get(feed_name)
+        if entry is None:
             # First time seeing this feed
-            existing_data[feed_name] = {
+            entry = existing_data[feed_name] = {
                 "static_data": {
                     "icao": feed_dict['icao'].upper(),
                     "location": feed_dict['location'],
@@ -335,7 +352,7 @@ def update_feed_data(existing_data, feeds):
             }
         
         # Add the time series data
-        existing_data[feed_name]["time_series"].append({
+        entry["time_series"].append({
             "timestamp": feed_dict['timestamp'],
             "status": feed_dict['status'],
             "listeners": feed_dict['listeners'],
@@ -345,21 +362,67 @@ def update_feed_data(existing_data, feeds):
     
     return existing_data
 
+# Body of an S3 object (or object summary), decompressed if it was stored gzip-encoded
+def read_s3_body(s3_object):
+    response = s3_object.get()
+    body = response['Body'].read()
+    if response.get('ContentEncoding') == 'gzip':
+        body = gzip.decompress(body)
+    return body
+
+# Created once per container, so warm Lambda invocations reuse it and its connection pool
+_S3 = boto3.resource('s3')
+
+# Raw index bytes and their ETag per (bucket, index name); a conditional GET revalidates them,
+# so an unchanged index costs a bodiless 304 instead of a full download
+_INDEX_CACHE = {}
+
+def load_index(bucket_name, base_index_name="liveatc_feeds_index.json"):
+    cache_key = (bucket_name, base_index_name)
+    cached = _INDEX_CACHE.get(cache_key)
+    index_object = _S3.Object(bucket_name, base_index_name)
+    try:
+        response = index_object.get(IfNoneMatch=cached[0]) if cached else index_object.get()
+    except ClientError as e:
+        if cached and e.response['Error']['Code'] in ('304', 'NotModified'):
+            return orjson.loads(cached[1])
+        raise
+    body = response['Body'].read()
+    _INDEX_CACHE[cache_key] = (response['ETag'], body)
+    return orjson.loads(body)
+
+# boto3 resources are not thread-safe, so each download thread gets its own session's resource
+_THREAD_LOCAL = threading.local()
+
+def _thread_s3():
+    s3 = getattr(_THREAD_LOCAL, 's3', None)
+    if s3 is None:
+        s3 = _THREAD_LOCAL.s3 = boto3.session.Session().resource('s3')
+    return s3
+
+# Records of a JSON Lines object, decoded one line at a time as the (possibly gzip-encoded)
+# body streams in, so neither the whole body nor its decompressed form is held in memory
+def iter_s3_records(s3_object):
+    response = s3_object.get()
+    if response.get('ContentEncoding') == 'gzip':
+        lines = gzip.GzipFile(fileobj=response['Body'])
+    else:
+        lines = response['Body'].iter_lines()
+    for line in lines:
+        if line.strip():
+            yield orjson.loads(line)
+
 # Create and update an index file to track all partitions
 def update_index_file(bucket_name, new_filename, base_index_name="liveatc_feeds_index.json"):
-    s3 = boto3.resource('s3')
-    
     # Try to load existing index
     index_data = {"partitions": []}
     try:
-        index_object = s3.Object(bucket_name, base_index_name)
-        file_content = index_object.get()['Body'].read().decode('utf-8')
-        index_data = json.loads(file_content)
+        index_data = load_index(bucket_name, base_index_name)
     except Exception as e:
         print(f"No existing index found or error reading: {e}")
     
-    # Extract date from filename (assuming format liveatc_feeds_YYYY-MM-DD.json)
-    date_str = new_filename.split('_')[-1].split('.')[0]
+    # Extract date from filename (liveatc_feeds_YYYY-MM-DD.json or the liveatc_feeds_YYYY-MM-DD/ prefix)
+    date_str = _PARTITION_DATE_RE.search(new_filename).group()
     
     # Check if this partition already exists in index
     for partition in index_data["partitions"]:
@@ -384,43 +447,93 @@ def update_index_file(bucket_name, new_filename, base_index_name="liveatc_feeds_
     )
     
     # Update the index file
-    index_object = s3.Object(bucket_name, base_index_name)
-    index_object.put(
-        Body=json.dumps(index_data, indent=2),
+    _write_index(bucket_name, index_data, base_index_name)
+    print(f"Updated index file with partition {new_filename}")
+
+# Writes the index, remembering what was written so the next load can revalidate it
+def _write_index(bucket_name, index_data, base_index_name):
+    body = orjson.dumps(index_data, option=orjson.OPT_INDENT_2)
+    response = _S3.Object(bucket_name, base_index_name).put(
+        Body=body,
         ContentType='application/json'
     )
-    print(f"Updated index file with partition {new_filename}")
+    _INDEX_CACHE[(bucket_name, base_index_name)] = (response['ETag'], body)
 
-# Modified save_to_s3 function with index update
+# Modified save_to_s3 function with index update.
+# Each run is written as its own JSON Lines object under the day's prefix
+# (liveatc_feeds_YYYY-MM-DD/<timestamp>.jsonl), so nothing already stored is read or rewritten
 def save_to_s3(feeds, bucket_name, base_filename="liveatc_feeds"):
-    s3 = boto3.resource('s3')
-    
     # Create partition key based on current date (YYYY-MM-DD format)
-    current_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    filename = f"{base_filename}_{current_date}.json"
-    
-    # Check if today's file exists in S3 and download it
-    existing_data = {}
-    try:
-        s3_object = s3.Object(bucket_name, filename)
-        file_content = s3_object.get()['Body'].read().decode('utf-8')
-        existing_data = json.loads(file_content)
-    except Exception as e:
-        print(f"No existing file found for today or error reading: {e}")
+    now = datetime.now(timezone.utc)
+    partition = f"{base_filename}_{now.strftime('%Y-%m-%d')}/"
+    filename = f"{partition}{now.strftime('%Y%m%dT%H%M%S%fZ')}.jsonl"
     
-    # Update data using the common function
-    updated_data = update_feed_data(existing_data, feeds)
+    # One feed record per line, gzipped; the records repeat the same keys, ICAO codes
+    # and METAR tokens, so they compress very well
+    body = b''.join(orjson.dumps(feed) + b'\n' for feed in feeds)
     
-    # Upload updated data to S3
-    s3_object = s3.Object(bucket_name, filename)
+    # Upload this run's data to S3
+    s3_object = _S3.Object(bucket_name, filename)
     s3_object.put(
-        Body=json.dumps(updated_data, indent=2),
-        ContentType='application/json'
+        Body=gzip.compress(body, compresslevel=6),
+        ContentType='application/x-ndjson',
+        ContentEncoding='gzip'
     )
-    print(f"Successfully updated {filename} in S3 bucket {bucket_name}")
+    print(f"Successfully wrote {filename} to S3 bucket {bucket_name}")
     
     # Update the index file
-    update_index_file(bucket_name, filename)
+    update_index_file(bucket_name, partition)
+
+# Converts the legacy single-object daily partitions (liveatc_feeds_YYYY-MM-DD.json) to the
+# append-only layout. aggregate_feed_data reads both layouts, so this is optional; it moves
+# history onto one format. Sample k of every feed goes into run object k, keyed at midnight
+# of that day so the migrated runs sort before any run written under the new layout. The
+# index is pointed at the prefix before the legacy entry is dropped, and the legacy objects
+# themselves are left in place for anything still reading them directly. Safe to rerun.
+def migrate_legacy_partitions(bucket_name, base_index_name="liveatc_feeds_index.json"):
+    index_data = load_index(bucket_name, base_index_name)
+    legacy_filenames = [partition["filename"] for partition in index_data.get("partitions", [])
+                        if not partition["filename"].endswith('/')]
+    
+    for filename in legacy_filenames:
+        partition_data = orjson.loads(read_s3_body(_S3.Object(bucket_name, filename)))
+        
+        runs = []
+        for feed_name, feed_data in partition_data.items():
+            static_data = feed_data["static_data"]
+            for position, sample in enumerate(feed_data["time_series"]):
+                if position == len(runs):
+                    runs.append([])
+                runs[position].append({
+                    "icao": static_data.get("icao", ""),
+                    "location": static_data.get("location"),
+                    "frequencies": static_data.get("frequencies"),
+                    "channel_types": static_data.get("channel_types", []),
+                    "status": sample.get("status"),
+                    "listeners": sample.get("listeners"),
+                    "total_listeners": sample.get("total_listeners"),
+                    "metar": sample.get("metar"),
+                    "timestamp": sample.get("timestamp"),
+                    "feed_name": feed_name
+                })
+        
+        date_str = _PARTITION_DATE_RE.search(filename).group()
+        partition = f"{filename[:filename.index(date_str) + len(date_str)]}/"
+        for position, records in enumerate(runs):
+            body = b''.join(orjson.dumps(record) + b'\n' for record in records)
+            _S3.Object(bucket_name, f"{partition}{date_str.replace('-', '')}T000000{position:06d}Z.jsonl").put(
+                Body=gzip.compress(body, compresslevel=6),
+                ContentType='application/x-ndjson',
+                ContentEncoding='gzip'
+            )
+        print(f"Migrated {filename} to {len(runs)} run objects under {partition}")
+        
+        update_index_file(bucket_name, partition, base_index_name)
+        index_data = load_index(bucket_name, base_index_name)
+        index_data["partitions"] = [entry for entry in index_data["partitions"] if entry["filename"] != filename]
+        _write_index(bucket_name, index_data, base_index_name)
+    
+    return legacy_filenames
 
 # New function to aggregate data across multiple partitions
 def aggregate_feed_data(bucket_name, start_date=None, end_date=None, feed_names=None, 
@@ -439,8 +552,6 @@ def aggregate_feed_data(bucket_name, start_date=None, end_date=None, feed_names=
     Returns:
         dict: Aggregated feed data
     """
-    s3 = boto3.resource('s3')
-    
     # Set default end_date to today if not provided
     if not end_date:
         end_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
@@ -455,9 +566,7 @@ def aggregate_feed_data(bucket_name, start_date=None, end_date=None, feed_names=
     
     # Load the index file to get list of partitions
     try:
-        index_object = s3.Object(bucket_name, base_index_name)
-        file_content = index_object.get()['Body'].read().decode('utf-8')
-        index_data = json.loads(file_content)
+        index_data = load_index(bucket_name, base_index_name)
     except Exception as e:
         print(f"Error loading index file: {e}")
         return {}
@@ -472,38 +581,74 @@ def aggregate_feed_data(bucket_name, start_date=None, end_date=None, feed_names=
     # Initialize aggregate data
     aggregated_data = {}
     
-    # Process each relevant partition
-    for filename in relevant_partitions:
-        try:
-            # Load partition data
-            s3_object = s3.Object(bucket_name, filename)
-            file_content = s3_object.get()['Body'].read().decode('utf-8')
-            partition_data = json.loads(file_content)
-            
-            # Merge into aggregated data
-            for feed_name, feed_data in partition_data.items():
-                # Skip feeds not in feed_names if feed_names is specified
-                if feed_names and feed_name not in feed_names:
-                    continue
-                    
-                if feed_name not in aggregated_data:
-                    # First occurrence of this feed, copy all data
-                    aggregated_data[feed_name] = {
-                        "static_data": feed_data["static_data"].copy(),
-                        "time_series": feed_data["time_series"].copy()
-                    }
+    # Object keys making up a partition: every run object under an append-only prefix, or the legacy file itself
+    def list_partition(filename):
+        if filename.endswith('/'):
+            return [summary.key for summary in _thread_s3().Bucket(bucket_name).objects.filter(Prefix=filename)]
+        return [filename]
+    
+    # Download and decode one object; merging stays on the calling thread so partitions apply in order
+    def load_object(key):
+        s3_object = _thread_s3().Object(bucket_name, key)
+        if key.endswith('.jsonl'):
+            feed_records = iter_s3_records(s3_object)
+            if feed_names:
+                feed_records = (record for record in feed_records
+                                if record['feed_name'] in feed_names)
+            return list(feed_records)
+        return orjson.loads(read_s3_body(s3_object))
+    
+    # S3 GETs are independent and IO-bound, so list and download them concurrently
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        listings = [(filename, pool.submit(list_partition, filename)) for filename in relevant_partitions]
+        downloads = []
+        for filename, listing in listings:
+            try:
+                downloads.append((filename, [pool.submit(load_object, key) for key in listing.result()]))
+            except Exception as e:
+                print(f"Error processing partition {filename}: {e}")
+        
+        # Each partition's time series is already chronological, so keep them as separate
+        # chunks per feed and heap-merge once at the end instead of resorting the concatenation
+        time_series_chunks = {}
+        
+        # Process each relevant partition
+        for filename, futures in downloads:
+            try:
+                if filename.endswith('/'):
+                    # Append-only partition: one JSON Lines object per run, keys sort chronologically
+                    partition_data = {}
+                    for future in futures:
+                        update_feed_data(partition_data, future.result())
                 else:
-                    # Feed already exists in aggregated data, append time series
-                    aggregated_data[feed_name]["time_series"].extend(feed_data["time_series"])
-        except Exception as e:
-            print(f"Error processing partition {filename}: {e}")
-    
-    # For each feed, sort time_series by timestamp to ensure chronological order
-    for feed_name in aggregated_data:
-        aggregated_data[feed_name]["time_series"] = sorted(
-            aggregated_data[feed_name]["time_series"],
-            key=lambda x: x["timestamp"]
-        )
+                    # Legacy partition: the whole day as one JSON document (still read, so
+                    # history written before the append-only layout stays available)
+                    partition_data = futures[0].result()
+                
+                # Merge into aggregated data
+                for feed_name, feed_data in partition_data.items():
+                    # Skip feeds not in feed_names if feed_names is specified
+                    if feed_names and feed_name not in feed_names:
+                        continue
+                        
+                    if feed_name not in aggregated_data:
+                        # First occurrence of this feed; partition_data is discarded after the merge, so take its lists as-is
+                        aggregated_data[feed_name] = {
+                            "static_data": feed_data["static_data"],
+                            "time_series": feed_data["time_series"]
+                        }
+                        time_series_chunks[feed_name] = [feed_data["time_series"]]
+                    else:
+                        # Feed already exists in aggregated data, add this partition's time series
+                        time_series_chunks[feed_name].append(feed_data["time_series"])
+            except Exception as e:
+                print(f"Error processing partition {filename}: {e}")
+    
+    # For each feed, merge the chronological chunks into one time_series
+    by_timestamp = itemgetter("timestamp")
+    for feed_name, chunks in time_series_chunks.items():
+        if len(chunks) > 1:
+            aggregated_data[feed_name]["time_series"] = list(heapq.merge(*chunks, key=by_timestamp))
     
     return aggregated_data
 
@@ -513,7 +658,15 @@ def lambda_handler(event, context):
     if not bucket_name:
         return {
             'statusCode': 500,
-            'body': json.dumps('S3_BUCKET_NAME environment variable not set')
+            'body': orjson.dumps('S3_BUCKET_NAME environment variable not set').decode()
+        }
+    
+    # One-off conversion of legacy daily partitions to the append-only layout
+    if event.get('migrate_legacy'):
+        migrated = migrate_legacy_partitions(bucket_name)
+        return {
+            'statusCode': 200,
+            'body': orjson.dumps({'migrated': migrated}).decode()
         }
     
     # Check if this is a data aggregation request
@@ -533,24 +686,28 @@ def lambda_handler(event, context):
         
         # For large datasets, rather than returning directly, save to a temporary file
         if event.get('save_result'):
-            result_filename = f"aggregated_result_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.json"
-            s3_object = boto3.resource('s3').Object(bucket_name, result_filename)
+            # Compact JSON, gzipped like the partition objects. The .gz suffix tells plain
+            # get_object readers to decompress; HTTP clients decode it from ContentEncoding,
+            # and read_s3_body handles both
+            result_filename = f"aggregated_result_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.json.gz"
+            s3_object = _S3.Object(bucket_name, result_filename)
             s3_object.put(
-                Body=json.dumps(aggregated_data, indent=2),
-                ContentType='application/json'
+                Body=gzip.compress(orjson.dumps(aggregated_data), compresslevel=6),
+                ContentType='application/json',
+                ContentEncoding='gzip'
             )
             return {
                 'statusCode': 200,
-                'body': json.dumps({
+                'body': orjson.dumps({
                     'message': 'Aggregation complete',
                     'result_file': result_filename
-                })
+                }).decode()
             }
         
         # For smaller datasets or direct API calls
         return {
             'statusCode': 200,
-            'body': json.dumps(aggregated_data)
+            'body': orjson.dumps(aggregated_data).decode()
         }
     
     # Standard data collection flow
@@ -561,7 +718,7 @@ def lambda_handler(event, context):
     
     return {
         'statusCode': 200,
-        'body': json.dumps(f'Successfully processed {len(feeds)} total feeds')
+        'body': orjson.dumps(f'Successfully processed {len(feeds)} total feeds').decode()
     }
 
 async def process_urls():
@@ -575,18 +732,62 @@ async def process_urls():
             ]
     
     all_feeds = []
+    loop = asyncio.get_running_loop()
+    
+    # Parse pages on separate cores. With a single core a process pool only adds pickling
+    # overhead, and AWS Lambda has no /dev/shm so multiprocessing can't start there; in both
+    # cases the loop's default thread pool is used instead
+    parse_pool = None
+    cpu_count = os.cpu_count() or 1
+    if cpu_count > 1:
+        try:
+            parse_pool = ProcessPoolExecutor(max_workers=min(len(urls), cpu_count))
+        except (OSError, NotImplementedError):
+            pass
+    
+    # At most as many requests in flight as the connector allows per host, so a request's
+    # total timeout only starts once it can actually get a connection
+    request_slots = asyncio.Semaphore(4)
     
-    # Create a ClientSession with SSL verification disabled
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=False)) as session:
-        for url in urls:
-            print(f"Now fetching {url} Please wait...")
+    async def fetch_and_parse(session, url):
+        async with request_slots:
             html = await fetch(session, url)
-            
-            # Extract feed data
-            feeds = extract_feed_data(html)
-            all_feeds.extend(feeds)
-            
-            print(f"Successfully processed {len(feeds)} feeds for {url}")
+        # Parse off the event loop so it keeps servicing the other downloads
+        feeds = await loop.run_in_executor(parse_pool, parse_feed_page, html)
+        print(f"Successfully processed {len(feeds)} feeds for {url}")
+        return feeds
+    
+    # Create a single ClientSession with SSL verification disabled so the
+    # connection pool is shared; every URL is on liveatc.net, so limit_per_host
+    # caps how many pages are requested from it at once
+    connector = aiohttp.TCPConnector(ssl=False, limit=12, limit_per_host=4)
+    # Bound connecting and each socket read so one stalled response can't hold up the whole run,
+    # and cap each request at a minute overall so a server trickling bytes in under the read
+    # timeout can't either. request_slots keeps the wait for a pooled connection out of that minute
+    timeout = aiohttp.ClientTimeout(total=60, sock_connect=10, sock_read=30)
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            print(f"Now fetching {len(urls)} feed pages. Please wait...")
+            # A page that fails to download or parse is reported and skipped rather than
+            # discarding the feeds from every other page
+            results = await asyncio.gather(*(fetch_and_parse(session, url) for url in urls),
+                                           return_exceptions=True)
+    finally:
+        if parse_pool:
+            parse_pool.shutdown()
+    
+    failed_urls = []
+    for url, feeds in zip(urls, results):
+        # BaseException, since a cancelled fetch comes back as CancelledError, which is not an Exception
+        if isinstance(feeds, BaseException):
+            # repr, since timeouts stringify to an empty message
+            print(f"Error processing {url}: {feeds!r}")
+            failed_urls.append(url)
+            continue
+        all_feeds.extend(feeds)
+    
+    if failed_urls:
+        print(f"Skipped {len(failed_urls)} of {len(urls)} feed pages: {', '.join(failed_urls)}")
     
     return all_feeds
 
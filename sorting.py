@@ -1,17 +1,35 @@
 import json
+import os
+import orjson
+import numpy as np
 import pandas as pd
 from tabulate import tabulate
-from statistics import mean
 from typing import Dict, List, Any
 
+# Series longer than this are downsampled to about _DOWNSAMPLE_POINTS points before plotting
+_DOWNSAMPLE_THRESHOLD = 4000
+_DOWNSAMPLE_POINTS = 3000
+# Plots with more points than this, over all lines, are rasterized instead of drawn as vector paths
+_RASTERIZE_THRESHOLD = 5000
+
+# Shared default for feeds without channel types, so no list is allocated per feed
+_NO_CHANNEL_TYPES = ('N/A',)
+
+# Columns of the metrics table, in display order
+_METRIC_COLUMNS = ('feed_name', 'icao', 'location', 'channel_types',
+                   'avg_listeners', 'max_listeners', 'avg_total_listeners', 'data_points')
+_CATEGORY_COLUMNS = ('icao', 'location', 'channel_types')
+_INT32_COLUMNS = ('max_listeners', 'data_points')
+
 def load_data(file_path: str) -> Dict[str, Any]:
     """Load JSON data from the specified file path."""
-    with open(file_path, 'r') as file:
-        return json.load(file)
+    with open(file_path, 'rb') as file:
+        return orjson.loads(file.read())
 
-def calculate_metrics(data: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Calculate listener count metrics for each feed."""
-    results = []
+def calculate_metrics(data: Dict[str, Any]) -> pd.DataFrame:
+    """Calculate listener count metrics for each feed, one row per feed."""
+    # Filled column by column, so the DataFrame is built without a per-feed dict
+    columns = {column: [] for column in _METRIC_COLUMNS}
     
     for feed_name, feed_data in data.items():
         if 'time_series' not in feed_data:
@@ -23,34 +41,108 @@ def calculate_metrics(data: Dict[str, Any]) -> List[Dict[str, Any]]:
         if not time_series:
             continue
             
-        listener_counts = [entry.get('listeners', 0) for entry in time_series]
-        total_listener_counts = [entry.get('total_listeners', 0) for entry in time_series]
-        
-        # Calculate metrics
-        avg_listeners = mean(listener_counts) if listener_counts else 0
-        max_listeners = max(listener_counts) if listener_counts else 0
-        avg_total_listeners = mean(total_listener_counts) if total_listener_counts else 0
+        if len(time_series) == 1:
+            # A single sample is its own mean and max; no array needed
+            entry = time_series[0]
+            max_listeners = int(entry.get('listeners', 0))
+            avg_listeners = float(max_listeners)
+            avg_total_listeners = float(entry.get('total_listeners', 0))
+        else:
+            # One pass over the entries fills both columns: [listeners, total_listeners]
+            counts = np.fromiter(((entry.get('listeners', 0), entry.get('total_listeners', 0))
+                                  for entry in time_series),
+                                 dtype=(np.int64, 2), count=len(time_series))
+            listener_counts = counts[:, 0]
+            total_listener_counts = counts[:, 1]
+            
+            # Calculate metrics (time_series is non-empty here, so the reductions are defined)
+            avg_listeners = float(listener_counts.mean())
+            max_listeners = int(listener_counts.max())
+            avg_total_listeners = float(total_listener_counts.mean())
         
         # Get location and ICAO if available
-        static_data = feed_data.get('static_data', {})
-        location = static_data.get('location', 'N/A')
-        icao = static_data.get('icao', 'N/A')
-        channel_types = ', '.join(static_data.get('channel_types', ['N/A']))
+        static_data = feed_data.get('static_data') or {}
+        static_get = static_data.get
+        location = static_get('location', 'N/A')
+        icao = static_get('icao', 'N/A')
+        channel_types = ', '.join(static_get('channel_types', _NO_CHANNEL_TYPES))
         
-        results.append({
-            'feed_name': feed_name,
-            'icao': icao,
-            'location': location,
-            'channel_types': channel_types,
-            'avg_listeners': avg_listeners,
-            'max_listeners': max_listeners,
-            'avg_total_listeners': avg_total_listeners,
-            'data_points': len(time_series)
-        })
+        columns['feed_name'].append(feed_name)
+        columns['icao'].append(icao)
+        columns['location'].append(location)
+        columns['channel_types'].append(channel_types)
+        columns['avg_listeners'].append(avg_listeners)
+        columns['max_listeners'].append(max_listeners)
+        columns['avg_total_listeners'].append(avg_total_listeners)
+        columns['data_points'].append(len(time_series))
+    
+    return _metrics_frame(pd.DataFrame(columns))
+
+def _metrics_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Repetitive text columns become categoricals, so sorting on them compares integer codes;
+    # the integer counts fit comfortably in 32 bits
+    return df.astype({**dict.fromkeys(_CATEGORY_COLUMNS, 'category'),
+                      **dict.fromkeys(_INT32_COLUMNS, 'int32')})
+
+def load_cached_metrics(file_path: str) -> pd.DataFrame:
+    """
+    Return the metrics cached for file_path, or None if there is no usable cache.
+    
+    Uses the same side-cache as app.py: <file_path>.metrics.parquet, tagged with the JSON
+    file's mtime in its source_mtime schema metadata. A cache written for a different
+    version of the file, one from before the averages were kept in float64, or one that
+    can't be read (including pyarrow being unavailable), is treated as missing so the
+    metrics are recomputed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pq.read_table(f"{file_path}.metrics.parquet")
+        metadata = table.schema.metadata or {}
+        if metadata.get(b'source_mtime') != repr(os.path.getmtime(file_path)).encode():
+            return None
+        if table.schema.field('avg_listeners').type != pa.float64():
+            return None
+        return _metrics_frame(table.to_pandas())
+    except (OSError, ValueError, KeyError, ImportError):
+        return None
+
+def save_cached_metrics(file_path: str, metrics: pd.DataFrame):
+    """Write the metrics next to file_path for the next run (see load_cached_metrics); failures are only reported."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(metrics, preserve_index=False)
+        table = table.replace_schema_metadata({'source_mtime': repr(os.path.getmtime(file_path))})
+        pq.write_table(table, f"{file_path}.metrics.parquet")
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Could not cache metrics: {e}")
+
+def _minmax_downsample(values: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the points to plot when a series is reduced to about n_out points.
     
-    return results
+    The series is split into n_out // 2 equal buckets and each bucket keeps its minimum and
+    maximum, so peaks survive; the first and last points are always kept.
+    """
+    n = len(values)
+    bucket_size = -(-n // (n_out // 2))
+    # Pad with the last value so the buckets reshape evenly; padded indices clip back to n - 1
+    padded = np.pad(values, (0, -n % bucket_size), mode='edge').reshape(-1, bucket_size)
+    offsets = np.arange(padded.shape[0]) * bucket_size
+    indices = np.concatenate(([0, n - 1], offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1)))
+    return np.unique(np.minimum(indices, n - 1))
+
+def build_icao_index(data: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Map each upper-cased ICAO code to the names of its feeds, in data order."""
+    icao_index = {}
+    for feed_name, feed_data in data.items():
+        if 'static_data' in feed_data and 'icao' in feed_data['static_data']:
+            icao_index.setdefault(feed_data['static_data']['icao'].upper(), []).append(feed_name)
+    return icao_index
 
-def display_airport_histogram(data: Dict[str, Any], airport_code: str, start_date: str = None, end_date: str = None):
+def display_airport_histogram(data: Dict[str, Any], airport_code: str, start_date: str = None, end_date: str = None,
+                              icao_index: Dict[str, List[str]] = None):
     """
     Display a histogram of listener counts for a specific airport over time.
     
@@ -59,25 +151,21 @@ def display_airport_histogram(data: Dict[str, Any], airport_code: str, start_dat
         airport_code: ICAO or other identifier to search for
         start_date: Optional start date in format YYYY-MM-DD
         end_date: Optional end date in format YYYY-MM-DD
+        icao_index: Optional index from build_icao_index, reused across calls; built from data if omitted
     """
     import matplotlib.pyplot as plt
     import matplotlib.dates
-    from datetime import datetime
     
+    # Hover annotations are optional; without mplcursors the plot gets a legend instead
     try:
         import mplcursors
     except ImportError:
-        print("Installing mplcursors for hover annotations...")
-        import subprocess
-        subprocess.check_call(["pip", "install", "mplcursors"])
-        import mplcursors
+        mplcursors = None
     
     # Find all feeds matching the airport code exactly
-    matching_feeds = {}
-    for feed_name, feed_data in data.items():
-        if 'static_data' in feed_data and 'icao' in feed_data['static_data']:
-            if airport_code.upper() == feed_data['static_data']['icao'].upper():
-                matching_feeds[feed_name] = feed_data
+    if icao_index is None:
+        icao_index = build_icao_index(data)
+    matching_feeds = {feed_name: data[feed_name] for feed_name in icao_index.get(airport_code.upper(), [])}
     
     if not matching_feeds:
         print(f"Identifier not found: {airport_code}")
@@ -85,44 +173,60 @@ def display_airport_histogram(data: Dict[str, Any], airport_code: str, start_dat
     
     print(f"Found {len(matching_feeds)} feeds for airport code: {airport_code}")
     
-    # Create a figure with standard size
-    fig, ax = plt.subplots(figsize=(12, 8))
+    # Date filter bounds, inclusive of the whole end day
+    try:
+        start_ts = pd.Timestamp(f"{start_date}T00:00:00", tz='UTC') if start_date else None
+        end_ts = pd.Timestamp(f"{end_date}T23:59:59", tz='UTC') if end_date else None
+    except ValueError:
+        print("Invalid date format, expected YYYY-MM-DD")
+        return
+    
+    # Create a figure with standard size; constrained layout is solved at draw time
+    fig, ax = plt.subplots(figsize=(12, 8), layout='constrained')
     
-    # Store line objects for later adding hover functionality
-    lines = []
+    # Date axis set up once for all feeds; the locator picks tick spacing from the plotted range
+    ax.xaxis_date()
+    date_locator = matplotlib.dates.AutoDateLocator()
+    ax.xaxis.set_major_locator(date_locator)
+    ax.xaxis.set_major_formatter(matplotlib.dates.ConciseDateFormatter(date_locator))
+    
+    # Line -> feed name, for the hover callback to look up the selected line directly
+    line_feeds = {}
     
     for feed_name, feed_data in matching_feeds.items():
         if 'time_series' not in feed_data or not feed_data['time_series']:
             continue
             
-        # Extract timestamps and listener counts
-        timestamps = []
-        listener_counts = []
+        # Extract timestamps and listener counts, parsing all timestamps in one call;
+        # unparseable ones become NaT and are masked out with the date filter
+        rows = [entry for entry in feed_data['time_series'] if 'timestamp' in entry and 'listeners' in entry]
+        timestamps = pd.to_datetime([entry['timestamp'] for entry in rows], utc=True,
+                                    format='ISO8601', errors='coerce')
+        listener_counts = np.fromiter((entry['listeners'] for entry in rows), dtype=np.int64, count=len(rows))
+        
+        mask = timestamps.notna()
+        if start_ts is not None:
+            mask &= timestamps >= start_ts
+        if end_ts is not None:
+            mask &= timestamps <= end_ts
         
-        for entry in feed_data['time_series']:
-            if 'timestamp' in entry and 'listeners' in entry:
-                try:
-                    # Convert timestamp to datetime
-                    dt = datetime.fromisoformat(entry['timestamp'].replace('Z', '+00:00'))
-                    
-                    # Apply date filtering if specified
-                    if start_date:
-                        start_dt = datetime.fromisoformat(f"{start_date}T00:00:00+00:00")
-                        if dt < start_dt:
-                            continue
-                    if end_date:
-                        end_dt = datetime.fromisoformat(f"{end_date}T23:59:59+00:00") 
-                        if dt > end_dt:
-                            continue
-                            
-                    timestamps.append(dt)
-                    listener_counts.append(entry['listeners'])
-                except (ValueError, TypeError):
-                    continue
+        # Naive UTC datetime64 values keep matplotlib off its per-point timezone conversion
+        timestamps = timestamps[mask].tz_convert(None).to_numpy(dtype='datetime64[ns]')
+        listener_counts = listener_counts[mask]
         
-        if timestamps and listener_counts:
+        # Long series are min-max downsampled; the plot looks the same at screen resolution
+        if len(timestamps) > _DOWNSAMPLE_THRESHOLD:
+            keep = _minmax_downsample(listener_counts, _DOWNSAMPLE_POINTS)
+            timestamps = timestamps[keep]
+            listener_counts = listener_counts[keep]
+        
+        if len(timestamps):
             line, = ax.plot(timestamps, listener_counts, label=f"{feed_name}")
-            lines.append((line, feed_name))
+            line_feeds[line] = feed_name
+    
+    if sum(len(line.get_xdata()) for line in line_feeds) > _RASTERIZE_THRESHOLD:
+        for line in line_feeds:
+            line.set_rasterized(True)
     
     ax.set_title(f"Listener Counts for {airport_code}")
     ax.set_xlabel("Time")
@@ -130,37 +234,68 @@ def display_airport_histogram(data: Dict[str, Any], airport_code: str, start_dat
     ax.grid(True)
     plt.xticks(rotation=45)
     
-    # Add hover annotations (enhanced to make up for no legend)
-    cursor = mplcursors.cursor(hover=True)
-    
-    @cursor.connect("add")
-    def on_add(sel):
-        # Find which line was selected
-        for line, feed_name in lines:
-            if line == sel.artist:
-                # Get the x, y data point that was hovered over
-                x, y = sel.target
-                timestamp = matplotlib.dates.num2date(x).strftime('%Y-%m-%d %H:%M:%S')
-                sel.annotation.set_text(f"{feed_name}\nTime: {timestamp}\nListeners: {y:.0f}")
-                break
-    
-    plt.tight_layout()
+    if mplcursors is None:
+        ax.legend()
+    else:
+        # Add hover annotations (enhanced to make up for no legend)
+        cursor = mplcursors.cursor(hover=True)
+        
+        @cursor.connect("add")
+        def on_add(sel):
+            # Find which line was selected
+            feed_name = line_feeds.get(sel.artist)
+            if feed_name is None:
+                return
+            # Get the x, y data point that was hovered over
+            x, y = sel.target
+            timestamp = matplotlib.dates.num2date(x).strftime('%Y-%m-%d %H:%M:%S')
+            sel.annotation.set_text(f"{feed_name}\nTime: {timestamp}\nListeners: {y:.0f}")
     
     # Remove PNG saving code, only show the plot
-    print("Note: Hover over lines to see feed names and data points in the interactive window.")
+    if mplcursors is None:
+        print("Note: Install mplcursors (pip install mplcursors) for hover annotations.")
+    else:
+        print("Note: Hover over lines to see feed names and data points in the interactive window.")
     plt.show()
 
-def sort_and_display(metrics: List[Dict[str, Any]], sort_by: str = 'avg_listeners', ascending: bool = False, limit: int = None, save_csv: bool = False):
-    """Sort the metrics and display the results in a tabular format. Optionally save to CSV."""
-    # Convert to DataFrame for easier sorting and display
-    df = pd.DataFrame(metrics)
-    
-    # Sort the DataFrame
-    df_sorted = df.sort_values(by=sort_by, ascending=ascending)
+def _top_k_positions(values: np.ndarray, k: int, ascending: bool) -> np.ndarray:
+    """
+    Positions, in original order, of the k rows a stable sort would put first.
     
-    # Apply limit if specified
-    if limit:
-        df_sorted = df_sorted.head(limit)
+    np.argpartition finds the k-th value in O(n); rows tied with it are taken in original
+    order, as the stable sort would, so the result matches sort_values(...).head(k).
+    """
+    keys = values if ascending else -values
+    kth = keys[np.argpartition(keys, k - 1)[k - 1]]
+    better = np.flatnonzero(keys < kth)
+    tied = np.flatnonzero(keys == kth)[:k - len(better)]
+    return np.sort(np.concatenate((better, tied)))
+
+def _write_csv(df: pd.DataFrame, filename: str):
+    """Write a DataFrame to CSV with pyarrow's multi-threaded writer, or pandas' if pyarrow is unavailable."""
+    try:
+        import pyarrow as pa
+        import pyarrow.csv
+    except ImportError:
+        df.to_csv(filename, index=False)
+        return
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pyarrow.csv.write_csv(table, filename)
+
+def sort_and_display(metrics: pd.DataFrame, sort_by: str = 'avg_listeners', ascending: bool = False, limit: int = None, save_csv: bool = False):
+    """Sort the metrics and display the results in a tabular format. Optionally save to CSV."""
+    values = metrics[sort_by].to_numpy()
+    if limit and 0 < limit < len(metrics) // 4 and np.issubdtype(values.dtype, np.number):
+        # Small top-K of a numeric column: partition out the K rows, then sort only those
+        df_sorted = metrics.iloc[_top_k_positions(values, limit, ascending)]
+        df_sorted = df_sorted.sort_values(by=sort_by, ascending=ascending, kind='stable')
+    else:
+        # Sort the DataFrame
+        df_sorted = metrics.sort_values(by=sort_by, ascending=ascending, kind='stable')
+        
+        # Apply limit if specified
+        if limit:
+            df_sorted = df_sorted.head(limit)
     
     if save_csv:
         # Create a filename based on the sort parameters
@@ -170,7 +305,7 @@ def sort_and_display(metrics: List[Dict[str, Any]], sort_by: str = 'avg_listener
         filename += ".csv"
         
         # Save to CSV
-        df_sorted.to_csv(filename, index=False)
+        _write_csv(df_sorted, filename)
         print(f"Data saved to {filename}")
     else:
         # Format the table for terminal display
@@ -184,14 +319,23 @@ def main():
     file_path = "liveatc_feeds.json"  # Update this to your actual file path
     
     try:
-        # Load data
-        print(f"Loading data from {file_path}...")
-        data = load_data(file_path)
-        print(f"Loaded data for {len(data)} feeds.")
-        
-        # Calculate metrics
-        metrics = calculate_metrics(data)
-        print(f"Calculated metrics for {len(metrics)} feeds.")
+        # Reuse the metrics from a previous run if the data file hasn't changed;
+        # the raw data is then only loaded if a histogram is requested
+        data = None
+        icao_index = None
+        metrics = load_cached_metrics(file_path)
+        if metrics is not None:
+            print(f"Loaded cached metrics for {len(metrics)} feeds.")
+        else:
+            # Load data
+            print(f"Loading data from {file_path}...")
+            data = load_data(file_path)
+            print(f"Loaded data for {len(data)} feeds.")
+            
+            # Calculate metrics
+            metrics = calculate_metrics(data)
+            print(f"Calculated metrics for {len(metrics)} feeds.")
+            save_cached_metrics(file_path, metrics)
         
         # Display options
         while True:
@@ -215,14 +359,18 @@ def main():
                 airport_code = input("Enter airport code (ICAO): ")
                 start_date = input("Enter start date (YYYY-MM-DD) or leave blank: ")
                 end_date = input("Enter end date (YYYY-MM-DD) or leave blank: ")
-                display_airport_histogram(data, airport_code, start_date or None, end_date or None)
+                if data is None:
+                    print(f"Loading data from {file_path}...")
+                    data = load_data(file_path)
+                if icao_index is None:
+                    icao_index = build_icao_index(data)
+                display_airport_histogram(data, airport_code, start_date or None, end_date or None, icao_index)
                 continue
             
             if choice == '7':
                 # Export all data without sorting
-                df = pd.DataFrame(metrics)
                 filename = "all_feeds_data.csv"
-                df.to_csv(filename, index=False)
+                _write_csv(metrics, filename)
                 print(f"All data saved to {filename}")
                 continue
                 
@@ -243,7 +391,7 @@ def main():
             elif choice == '5':
                 sort_and_display(metrics, 'location', True, limit, save_csv)
             elif choice == '6':
-                columns = metrics[0].keys() if metrics else []
+                columns = list(metrics.columns)
                 print(f"Available columns: {', '.join(columns)}")
                 sort_column = input("Enter column name to sort by: ")
                 if sort_column in columns:
@@ -257,7 +405,7 @@ def main():
                 
     except FileNotFoundError:
         print(f"Error: File not found at {file_path}")
-    except json.JSONDecodeError:
+    except json.JSONDecodeError:  # orjson.JSONDecodeError subclasses it
         print(f"Error: Invalid JSON format in {file_path}")
     except Exception as e:
         print(f"An error occurred: {str(e)}")